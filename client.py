@@ -6,36 +6,46 @@ import email.utils  # for RFC-1123 date
 
 HOST = '127.0.0.1'
 PORT = 8080
+# Headers identical for every request; only User-Agent varies per client
+DEFAULT_HEADERS = {"Host": f"{HOST}:{PORT}", "Connection": "close"}
+DEFAULT_HEADER_BLOCK = "".join(f"{k}: {v}\r\n" for k, v in DEFAULT_HEADERS.items()).encode('utf-8')
 
 def send_request(method, path='/', extra_headers=None, client_id=0):
-    """Send a single HTTP request and print the response (tagged by client ID)."""
-    if extra_headers is None:
-        extra_headers = {}
-
-    request_line = f"{method} {path} HTTP/1.1\r\n"
-    headers = {
-        "Host": f"{HOST}:{PORT}",
-        "Connection": "close",
-        "User-Agent": f"SimpleTestClient/{client_id}"
-    }
-    headers.update(extra_headers)
-
-    header_block = ''.join(f"{k}: {v}\r\n" for k, v in headers.items())
-    request_bytes = (request_line + header_block + "\r\n").encode('utf-8')
+    """
+    Send a single HTTP request and print the response (tagged by client ID).
+    extra_headers may replace the default Host, Connection and User-Agent
+    (names compared case-insensitively).
+    """
+    overridden = {name.lower() for name in extra_headers} if extra_headers else set()
+    # Encode each line once and join: one final buffer, no re-scan of a big str
+    lines = [f"{method} {path} HTTP/1.1\r\n".encode('utf-8')]
+    if overridden.isdisjoint(name.lower() for name in DEFAULT_HEADERS):
+        lines.append(DEFAULT_HEADER_BLOCK)             # common case: pre-encoded
+    else:
+        lines.extend(f"{k}: {v}\r\n".encode('utf-8')
+                     for k, v in DEFAULT_HEADERS.items() if k.lower() not in overridden)
+    if "user-agent" not in overridden:
+        lines.append(f"User-Agent: SimpleTestClient/{client_id}\r\n".encode('utf-8'))
+    if extra_headers:
+        lines.extend(f"{k}: {v}\r\n".encode('utf-8') for k, v in extra_headers.items())
+    lines.append(b"\r\n")
+    request_bytes = b"".join(lines)
 
-    response = b""
+    parts = []
     try:
         with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)  # no Nagle delay
             sock.connect((HOST, PORT))
             sock.sendall(request_bytes)
             while True:
                 chunk = sock.recv(4096)
                 if not chunk:
                     break
-                response += chunk
+                parts.append(chunk)            # join once at the end: O(n), not O(n²)
     except Exception as exc:
         print(f"[Client {client_id}] Connection error: {exc}")
         return
+    response = b"".join(parts)
 
     print(f"\n--- Client {client_id} Response ---")
     print(response.decode('iso-8859-1', errors='replace'))
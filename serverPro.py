@@ -1,32 +1,87 @@
 import socket
 import os
+import errno
+import stat
 import time
 import urllib.parse
 import email.utils
-from datetime import datetime, timezone
+import calendar
 import threading
+import queue
+import selectors
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 
-log_lock = threading.Lock()
+cache_lock = threading.Lock()
+recv_local = threading.local()   # per-worker reusable receive buffer
 # Configuration
 HOST = '0.0.0.0'        # Listen on all network interfaces
 PORT = 8080             # Default port for the server
 WWW_ROOT = 'www'        # Root directory for web files
+WWW_ROOT_REAL = os.path.realpath(WWW_ROOT)  # Resolved once, not per request
 LOG_FILE = 'server.log' # Path to log file
+LOG_BATCH_SIZE = 256    # Max log entries written per flush
+LOG_FLUSH_INTERVAL = 0.1  # Max seconds an entry waits before being flushed
+LISTEN_BACKLOG = 1024   # Pending-connection queue length for listen()
+RECV_SIZE = 65536       # Receive buffer size; also the request-head size limit
+MAX_WORKERS = max(32, (os.cpu_count() or 1) * 8)  # Threads serving connections
+MAX_CONNECTIONS = LISTEN_BACKLOG                  # Served + queued before answering 503
+KEEP_ALIVE_TIMEOUT = 15 # Seconds an idle persistent connection is kept open
+ACCEPT_PAUSE = 0.5      # Seconds accepting is paused when out of descriptors
+CLIENT_TIMEOUT = 10     # Seconds a whole request head, or one stalled write, may take
+CACHE_MAX_FILE_SIZE = 1024 * 1024  # Larger files are streamed, never cached
+CACHE_MAX_BYTES = 64 * 1024 * 1024 # Total content the file cache may hold
+FD_CACHE_MAX_ENTRIES = 64          # Large files whose descriptors stay open
+READAHEAD_SIZE = 2 * 1024 * 1024   # Bytes prefetched when a large file is opened
 
-# Supported MIME types for content
+# Pending log entries: (timestamp, client_addr, request_line, status_code)
+LOG_QUEUE = queue.SimpleQueue()
+
+# Linux TCP_CORK / BSD-macOS TCP_NOPUSH: hold partial segments until uncorked
+TCP_CORK = getattr(socket, "TCP_CORK", getattr(socket, "TCP_NOPUSH", None))
+
+# (version, Connection header) -> (keep_alive, encoded Connection value);
+# both usual spellings are listed so they match without a lower() call
+CONN_DECISION = {
+    (version, spelling): (value == "keep-alive", value.encode())
+    for version in ("HTTP/1.0", "HTTP/1.1")
+    for value in ("close", "keep-alive")
+    for spelling in (value, value.title())
+}
+# Any other (or no) Connection header: HTTP/1.1 persists, HTTP/1.0 closes
+CONN_DEFAULT = {"HTTP/1.1": (True, b"keep-alive"), "HTTP/1.0": (False, b"close")}
+
+# Request-line tokens accepted by parse_request(), mapped to interned str
+METHODS = {b"GET": "GET", b"HEAD": "HEAD"}
+VERSIONS = {b"HTTP/1.0": "HTTP/1.0", b"HTTP/1.1": "HTTP/1.1"}
+
+# Small-file cache: real path -> (st_mtime_ns, st_size, content, head),
+# oldest first; head is the file's 200 head from file_head()
+FILE_CACHE = OrderedDict()
+cache_bytes = 0    # total content held in FILE_CACHE (cache_lock held)
+# Descriptors of large files kept open for sendfile: real path -> CachedFd
+FD_CACHE = OrderedDict()
+
+# Supported MIME types for content, pre-encoded for the response head
 MIME_TYPES = {
-    ".html": "text/html",
-    ".htm":  "text/html",
-    ".txt":  "text/plain",
-    ".css":  "text/css",
-    ".js":   "application/javascript",
-    ".json": "application/json",
-    ".png":  "image/png",
-    ".jpg":  "image/jpeg",
-    ".jpeg": "image/jpeg",
-    ".gif":  "image/gif",
-    ".ico":  "image/x-icon"
+    ".html": b"text/html",
+    ".htm":  b"text/html",
+    ".txt":  b"text/plain",
+    ".css":  b"text/css",
+    ".js":   b"application/javascript",
+    ".json": b"application/json",
+    ".png":  b"image/png",
+    ".jpg":  b"image/jpeg",
+    ".jpeg": b"image/jpeg",
+    ".gif":  b"image/gif",
+    ".ico":  b"image/x-icon"
 }
+# Types worth compressing: a "<file>.gz" sibling is served to gzip clients
+COMPRESSIBLE_TYPES = {b"text/html", b"text/plain", b"text/css",
+                      b"application/javascript", b"application/json"}
+GZIP_SUFFIX = ".gz"
+# Sent with every 200 and 304 of a compressible type (RFC 7232 4.1)
+VARY_ENCODING = b"Vary: Accept-Encoding\r\n"
 
 # HTTP status codes and reason phrases
 STATUS_PHRASES = {
@@ -35,65 +90,420 @@ STATUS_PHRASES = {
     400: "Bad Request",
     403: "Forbidden",
     404: "Not Found",
-    415: "Unsupported Media Type"
+    415: "Unsupported Media Type",
+    503: "Service Unavailable"
+}
+
+def canned_response(status: int, message: str, extra_headers: str = "") -> bytes:
+    """
+    Pre-serialize a connection-closing error response at import time.
+    The two %b slots take the protocol version and the Date header value.
+    """
+    reason = STATUS_PHRASES[status]
+    body = (f"<html><body><h1>{status} {reason}</h1>"
+            f"<p>{message}</p></body></html>").encode()
+    head = (f"%b {status} {reason}\r\n"
+            f"Date: %b\r\n"
+            f"Content-Type: text/html\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"{extra_headers}"
+            f"Connection: close\r\n\r\n").encode()
+    return head + body.replace(b"%", b"%%")
+
+# Complete responses for errors raised before build_response() runs
+RESP_400 = canned_response(400, "Bad request.")
+RESP_403 = canned_response(403, "The requested resource is forbidden.")
+RESP_503 = canned_response(503, "The server is busy, please retry later.", "Retry-After: 1\r\n")
+
+# Head of every 200 response: version, Date, Connection, Last-Modified,
+# ETag, Content-Type, Content-Length and the encoding headers are the
+# only parts that vary
+OK_HEAD = (b"%b 200 OK\r\n"
+           b"Date: %b\r\n"
+           b"Connection: %b\r\n"
+           b"Last-Modified: %b\r\n"
+           b"ETag: %b\r\n"
+           b"Content-Type: %b\r\n"
+           b"Content-Length: %d\r\n"
+           b"%b\r\n")
+
+def make_etag(st: os.stat_result) -> str:
+    """Strong validator for a file version: its mtime in ns and size, in hex."""
+    return f'"{st.st_mtime_ns:x}-{st.st_size:x}"'
+
+def etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of an If-None-Match list against etag (RFC 7232 3.2)."""
+    if if_none_match.strip() == "*":
+        return True
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+def file_head(path: str, st: os.stat_result, content_type: bytes, size: int) -> bytes:
+    """
+    Fill the per-file parts of OK_HEAD, leaving the three %b slots for
+    version, Date and Connection that change from request to request.
+    A GZIP_SUFFIX path is the precompressed sibling of a compressible file.
+    """
+    encoding = b""
+    if content_type in COMPRESSIBLE_TYPES:
+        encoding = VARY_ENCODING
+        if path.endswith(GZIP_SUFFIX):
+            encoding = b"Content-Encoding: gzip\r\n" + encoding
+    return OK_HEAD % (b"%b", b"%b", b"%b", format_http_date(st.st_mtime).encode(),
+                      make_etag(st).encode(), content_type, size, encoding)
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """True if an Accept-Encoding value lists gzip with a non-zero q."""
+    for item in accept_encoding.split(","):
+        coding, _, params = item.partition(";")
+        if coding.strip().lower() == "gzip":
+            params = params.strip().lower()
+            try:
+                return (float(params[2:]) if params.startswith("q=") else 1.0) > 0
+            except ValueError:
+                return False
+    return False
+
+# Error page bodies produced by build_response(), keyed by status code
+ERROR_PAGES = {
+    status: (f"<html><head><title>{status} {reason}</title></head>"
+             f"<body><h1>{status} {reason}</h1>"
+             f"<p>The requested resource is not available.</p></body></html>").encode("utf-8")
+    for status, reason in STATUS_PHRASES.items() if status >= 400
+}
+
+def error_response(status: int, version: str, connection: bytes) -> bytes:
+    """
+    Pre-serialize a non-200 response of build_response() at import time.
+    The first %b slot takes the Date header value; a 304 carries no body
+    and takes the validated ETag in a second slot and the Vary header the
+    200 would carry (or b"") in a third.
+    """
+    reason = STATUS_PHRASES[status]
+    head = f"{version} {status} {reason}\r\nDate: %b\r\nConnection: {connection.decode()}\r\n"
+    if status == 304:
+        return (head + "ETag: %b\r\n%b\r\n").encode()
+    body = ERROR_PAGES[status]
+    head += f"Content-Type: text/html\r\nContent-Length: {len(body)}\r\n\r\n"
+    return head.encode() + body.replace(b"%", b"%%")
+
+# Every (status, version, connection) combination build_response() can answer with
+ERROR_RESPONSES = {
+    (status, version, connection): error_response(status, version, connection)
+    for status in (304, 403, 404, 415)
+    for version in ("HTTP/1.0", "HTTP/1.1")
+    for connection in (b"close", b"keep-alive")
 }
 
+# English names for HTTP-dates; strftime's %a / %b would follow the locale
+WEEKDAYS = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+MONTHS = ("Jan", "Feb", "Mar", "Apr", "May", "Jun",
+          "Jul", "Aug", "Sep", "Oct", "Nov", "Dec")
+
 def format_http_date(ts: float) -> str:
     """
     Convert a timestamp (seconds since epoch) to a string in HTTP-date format (RFC 1123).
     """
-    dt = datetime.fromtimestamp(ts, tz=timezone.utc)
-    return dt.strftime("%a, %d %b %Y %H:%M:%S GMT")
+    t = time.gmtime(ts)
+    return (f"{WEEKDAYS[t.tm_wday]}, {t.tm_mday:02d} {MONTHS[t.tm_mon - 1]} {t.tm_year} "
+            f"{t.tm_hour:02d}:{t.tm_min:02d}:{t.tm_sec:02d} GMT")
+
+date_now = (0, "")   # (epoch second, its HTTP-date), replaced as a whole tuple
+
+def current_http_date() -> str:
+    """
+    Return the HTTP-date for now, formatting it only once per second.
+    A racing thread at worst formats the same second twice.
+    """
+    global date_now
+    now = int(time.time())
+    cached = date_now
+    if cached[0] != now:
+        cached = date_now = (now, format_http_date(now))
+    return cached[1]
 
 def log_request(client_addr: str, request_line: str, status_code: int) -> None:
-    """Thread-safe request logger."""
-    timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    """Thread-safe request logger: queue the entry for log_writer(), never blocks."""
+    LOG_QUEUE.put((time.time(), client_addr, request_line, status_code))
+
+log_time = (0, "")   # (epoch second, its local log timestamp)
+
+def log_timestamp(ts: float) -> str:
+    """Local "YYYY-mm-dd HH:MM:SS" for ts, formatted only once per second."""
+    global log_time
+    second = int(ts)
+    cached = log_time
+    if cached[0] != second:
+        cached = log_time = (second, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(second)))
+    return cached[1]
+
+def format_log_entry(ts: float, client_addr: str, request_line: str, status_code: int) -> str:
+    """Render one queued request as a server.log line."""
+    timestamp = log_timestamp(ts)
     reason = STATUS_PHRASES.get(status_code, "")
-    entry = f"{timestamp} - {client_addr} - \"{request_line}\" - {status_code} {reason}\n"
-    with log_lock:                     # NEW
-        with open(LOG_FILE, "a") as f:
-            f.write(entry)
+    return f"{timestamp} - {client_addr} - \"{request_line}\" - {status_code} {reason}\n"
+
+def log_writer() -> None:
+    """
+    Drain LOG_QUEUE on a dedicated thread, writing up to LOG_BATCH_SIZE
+    entries per write+flush and letting none wait over LOG_FLUSH_INTERVAL.
+    A None entry flushes what is queued before it and ends the thread.
+    """
+    with open(LOG_FILE, "a") as f:
+        running = True
+        while running:
+            batch = [LOG_QUEUE.get()]                   # block until work exists
+            deadline = time.monotonic() + LOG_FLUSH_INTERVAL
+            while len(batch) < LOG_BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(LOG_QUEUE.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            if None in batch:                           # shutdown sentinel
+                batch = batch[:batch.index(None)]
+                running = False
+            f.write("".join(format_log_entry(*entry) for entry in batch))
+            f.flush()
 
+class CachedFd:
+    """
+    A read-only descriptor shared by every request streaming the same file.
+    Sends use explicit offsets, so concurrent users never disturb each other;
+    once evicted from FD_CACHE it is closed by whichever user finishes last.
+    """
+    __slots__ = ("fd", "path", "mtime_ns", "size", "head", "users", "evicted")
+
+    def __init__(self, fd: int, path: str, st: os.stat_result, content_type: bytes):
+        self.fd = fd
+        self.path = path
+        self.mtime_ns = st.st_mtime_ns
+        self.size = st.st_size
+        self.head = file_head(path, st, content_type, st.st_size)
+        self.users = 1
+        self.evicted = False
+
+def retire_fd(entry: CachedFd) -> None:
+    """Mark an entry evicted and close it if nobody uses it (cache_lock held)."""
+    entry.evicted = True
+    if entry.users == 0:
+        os.close(entry.fd)
+
+def acquire_fd(abs_path: str, st: os.stat_result, content_type: bytes) -> CachedFd:
+    """
+    Return a CachedFd for abs_path, reusing the cached descriptor when st
+    still matches it and opening (and caching) a fresh one otherwise.
+    """
+    with cache_lock:
+        entry = FD_CACHE.get(abs_path)
+        if entry is not None and entry.mtime_ns == st.st_mtime_ns and entry.size == st.st_size:
+            entry.users += 1
+            FD_CACHE.move_to_end(abs_path)
+            return entry
+    fd = os.open(abs_path, os.O_RDONLY | getattr(os, "O_CLOEXEC", 0) | getattr(os, "O_BINARY", 0))
+    if hasattr(os, "posix_fadvise"):             # Linux, BSD
+        try:
+            # streamed front to back: widen readahead and start the first chunk
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_SEQUENTIAL)
+            os.posix_fadvise(fd, 0, READAHEAD_SIZE, os.POSIX_FADV_WILLNEED)
+        except OSError:
+            pass                                  # advice only; some filesystems refuse
+    entry = CachedFd(fd, abs_path, os.fstat(fd), content_type)
+    with cache_lock:
+        stale = FD_CACHE.pop(abs_path, None)
+        if stale is not None:
+            retire_fd(stale)
+        FD_CACHE[abs_path] = entry
+        while len(FD_CACHE) > FD_CACHE_MAX_ENTRIES:
+            retire_fd(FD_CACHE.popitem(last=False)[1])   # evict least recently used
+    return entry
+
+def release_fd(entry: CachedFd) -> None:
+    """Drop one use of entry; the last user of an evicted entry closes it."""
+    with cache_lock:
+        entry.users -= 1
+        if entry.evicted and entry.users == 0:
+            os.close(entry.fd)
+
+def send_file(client_sock, entry: CachedFd) -> None:
+    """
+    Stream a whole cached file to the socket via sendfile(2): page cache →
+    socket with no user-space copy. Where os.sendfile is missing or refuses
+    the descriptor, the path is reopened (a shared descriptor's position
+    cannot be used) and copied with socket.sendfile's send() fallback.
+    """
+    offset = 0
+    writable = None                     # made on the first EAGAIN, reused for the rest
+    if hasattr(os, "sendfile"):
+        try:
+            while offset < entry.size:
+                try:
+                    sent = os.sendfile(client_sock.fileno(), entry.fd, offset, entry.size - offset)
+                except BlockingIOError:
+                    # a socket with a timeout is non-blocking underneath: wait for room
+                    if writable is None:
+                        writable = selectors.DefaultSelector()
+                        writable.register(client_sock, selectors.EVENT_WRITE)
+                    if not writable.select(client_sock.gettimeout()):
+                        raise TimeoutError("client stopped reading")
+                    continue
+                if sent == 0:
+                    break               # end of file before entry.size
+                offset += sent
+        except TimeoutError:
+            raise                       # the client stalled, not the sendfile call
+        except OSError:
+            if offset:
+                raise                   # failed mid-transfer: the connection is gone
+        else:
+            # checked outside the try so that only a refusal by sendfile
+            # itself falls through to the copy below
+            if offset < entry.size:
+                raise OSError("file truncated while being sent")
+            return
+        finally:
+            if writable is not None:
+                writable.close()
+    with open(entry.path, "rb") as f:
+        if client_sock.sendfile(f, 0, entry.size) < entry.size:
+            raise OSError("file truncated while being sent")
+
+def open_static_file(abs_path: str, st: os.stat_result, content_type: bytes):
+    """
+    Return (head, content, body_file) for abs_path, whose os.stat() result
+    the caller already holds as st; head is the file's 200 head from
+    file_head().
+    Files up to CACHE_MAX_FILE_SIZE are served as bytes from an LRU cache
+    that is revalidated against the file's mtime; larger files come back as
+    a CachedFd for send_file(), to be handed to release_fd() afterwards.
+    Raises OSError just like open().
+    """
+    global cache_bytes
+    if st.st_size > CACHE_MAX_FILE_SIZE:
+        body_file = acquire_fd(abs_path, st, content_type)
+        return body_file.head, None, body_file
+    with cache_lock:
+        entry = FILE_CACHE.get(abs_path)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            FILE_CACHE.move_to_end(abs_path)
+            return entry[3], entry[2], None
+    with open(abs_path, "rb") as f:
+        st = os.fstat(f.fileno())
+        content = f.read()
+    head = file_head(abs_path, st, content_type, len(content))
+    with cache_lock:
+        stale = FILE_CACHE.pop(abs_path, None)
+        if stale is not None:
+            cache_bytes -= len(stale[2])
+        FILE_CACHE[abs_path] = (st.st_mtime_ns, len(content), content, head)
+        cache_bytes += len(content)
+        while cache_bytes > CACHE_MAX_BYTES:
+            cache_bytes -= len(FILE_CACHE.popitem(last=False)[1][2])   # evict LRU
+    return head, content, None
+
+def send_response(client_sock, head: bytes, body: bytes) -> None:
+    """
+    Send head and an in-memory body with one gathering sendmsg() where the
+    socket supports it, so the cached body is never copied into a joined
+    bytes object; whatever the kernel did not take goes out via sendall().
+    """
+    if not body:
+        client_sock.sendall(head)
+    elif not hasattr(client_sock, "sendmsg"):   # e.g. Windows
+        client_sock.sendall(head + body)
+    else:
+        sent = client_sock.sendmsg([head, body])
+        if sent < len(head):
+            client_sock.sendall(memoryview(head)[sent:])
+            client_sock.sendall(body)
+        elif sent < len(head) + len(body):
+            client_sock.sendall(memoryview(body)[sent - len(head):])
+
+def static_file_head(abs_path: str, st: os.stat_result, content_type: bytes) -> bytes:
+    """
+    Return the 200 head of abs_path for a HEAD request without opening the
+    file: the head cached with its content or descriptor while that entry
+    still matches st, otherwise one formatted straight from st.
+    """
+    with cache_lock:
+        entry = FILE_CACHE.get(abs_path)
+        if entry is not None and entry[0] == st.st_mtime_ns and entry[1] == st.st_size:
+            return entry[3]
+        fd_entry = FD_CACHE.get(abs_path)
+        if fd_entry is not None and fd_entry.mtime_ns == st.st_mtime_ns and fd_entry.size == st.st_size:
+            return fd_entry.head
+    return file_head(abs_path, st, content_type, st.st_size)
+
+def recv_buffer() -> bytearray:
+    """
+    Return this worker thread's receive buffer, allocating it on first use.
+    Pool threads live for the whole server run, so the buffer is reused by
+    every request the thread serves.
+    """
+    buf = getattr(recv_local, "buf", None)
+    if buf is None:
+        buf = recv_local.buf = bytearray(RECV_SIZE)
+    return buf
 
 def parse_request(request_data: bytes):
     """
     Parse an HTTP request message and return (method, path, version, headers, request_line).
+    Header names in the headers dict are lower-cased.
     Raises ValueError for bad requests or PermissionError for forbidden paths.
     """
-    # Decode the request bytes to text (ISO-8859-1 allows raw 0-255 values)
-    try:
-        request_text = request_data.decode('iso-8859-1')
-    except Exception:
-        raise ValueError("Cannot decode request bytes")
-    # Split request into lines
-    lines = request_text.split("\r\n")
-    if len(lines) < 1 or lines[0] == "":
+    # Only the head is parsed; bytes after the blank line are never decoded
+    head_end = request_data.find(b"\r\n\r\n")
+    if head_end == -1:
+        head_end = len(request_data)
+    # The request line is split as bytes; only the path is decoded to text
+    line_end = request_data.find(b"\r\n", 0, head_end)
+    if line_end == -1:
+        line_end = head_end
+    if line_end == 0:
         raise ValueError("No request line")
-    request_line = lines[0]
-    parts = request_line.split(" ")
+    line = request_data[:line_end]
+    parts = line.split(b" ")
     if len(parts) != 3:
         raise ValueError("Malformed request line")
-    method, raw_path, version = parts
-    method = method.upper()
-    if method not in ("GET", "HEAD"):
+    method = METHODS.get(parts[0].upper())
+    if method is None:
         raise ValueError("Unsupported method")
-    if version not in ("HTTP/1.0", "HTTP/1.1"):
+    version = VERSIONS.get(parts[2])
+    if version is None:
         raise ValueError("Unsupported HTTP version")
-    # Parse headers
+    raw_path = parts[1].decode('iso-8859-1')
+    request_line = line.decode('iso-8859-1')      # kept for the access log
+    # Parse headers in place: find each CRLF and colon in the bytes and
+    # decode only the name and value (ISO-8859-1 allows raw 0-255 values).
+    # Names are case-insensitive, so they are stored lower-cased.
     headers = {}
-    idx = 1
-    while idx < len(lines) and lines[idx] != "":
-        header_line = lines[idx]
-        if ":" not in header_line:
+    pos = line_end + 2
+    while pos < head_end:
+        eol = request_data.find(b"\r\n", pos, head_end)
+        if eol == -1:
+            eol = head_end
+        colon = request_data.find(b":", pos, eol)
+        if colon == -1:
             raise ValueError("Malformed header line")
-        name, value = header_line.split(":", 1)
-        headers[name.strip()] = value.strip()
-        idx += 1
-    if version == "HTTP/1.1" and "Host" not in headers:
+        name = request_data[pos:colon].strip().lower().decode('iso-8859-1')
+        headers[name] = request_data[colon + 1:eol].strip().decode('iso-8859-1')
+        pos = eol + 2
+    if version == "HTTP/1.1" and "host" not in headers:
         raise ValueError("Missing Host header")
     # Process the request path (exclude query string and fragment)
-    path_only = raw_path.split('?', 1)[0].split('#', 1)[0]
-    decoded_path = urllib.parse.unquote(path_only)  # decode URL-encoded characters
+    for sep in ("?", "#"):
+        cut = raw_path.find(sep)
+        if cut != -1:
+            raw_path = raw_path[:cut]
+    # decode URL-encoded characters; most static paths have none
+    decoded_path = urllib.parse.unquote(raw_path) if "%" in raw_path else raw_path
     # Security: forbid any path that attempts to traverse directories
     if ".." in decoded_path:
         raise PermissionError("Forbidden path")
@@ -107,206 +517,363 @@ def parse_request(request_data: bytes):
 def build_response(method: str, normalized_path: str, version: str, headers: dict):
     """
     Build an HTTP response for the given request components.
-    Returns a tuple of (response_bytes, keep_alive, status_code).
+    Returns a tuple of (head, body, body_file, keep_alive, status_code).
+    body is the cached content of a 200 GET (b"" otherwise; error pages are
+    part of head). body_file is a CachedFd whose file must be sent after head
+    (200 GET of a file too large for the content cache), otherwise None.
     """
     status_code = 200
-    content = b""
-    response_headers = {}
     body = b""
 
     # Map the normalized path to a file in the WWW_ROOT directory
-    base_path = os.path.realpath(WWW_ROOT)
-    target_path = os.path.join(WWW_ROOT, normalized_path)
-    abs_path = os.path.realpath(target_path)
-    # Check if the resolved path is within the www directory
-    if not abs_path.startswith(base_path):
+    abs_path = os.path.realpath(os.path.join(WWW_ROOT_REAL, normalized_path))
+    # Check if the resolved path is within the www directory (a bare prefix
+    # test would also accept siblings such as "www2")
+    if os.path.commonpath([WWW_ROOT_REAL, abs_path]) != WWW_ROOT_REAL:
         status_code = 403  # outside of permitted directory
-    elif os.path.isdir(abs_path):
-        # If a directory is requested, look for an index.html
-        index_file = os.path.join(abs_path, "index.html")
-        if os.path.isfile(index_file):
-            abs_path = os.path.realpath(index_file)
-        else:
-            status_code = 403  # directory access is forbidden (no index file)
-    # If OK so far, attempt to open and read the file
-    file_mtime = None
-    if status_code == 200:
+    else:
+        # One stat answers exists / is-directory / size / mtime for the request
         try:
-            file_mtime = os.path.getmtime(abs_path)
-            with open(abs_path, "rb") as f:
-                content = f.read()
+            st = os.stat(abs_path)
+            if stat.S_ISDIR(st.st_mode):
+                # If a directory is requested, look for an index.html
+                index_file = os.path.realpath(os.path.join(abs_path, "index.html"))
+                try:
+                    st = os.stat(index_file)
+                    abs_path = index_file
+                except FileNotFoundError:
+                    status_code = 403  # directory access is forbidden (no index file)
+            if status_code == 200 and not stat.S_ISREG(st.st_mode):
+                status_code = 403  # only regular files are served (no FIFOs, devices)
         except FileNotFoundError:
             status_code = 404
         except PermissionError:
             status_code = 403
         except Exception:
             status_code = 404
-    # Determine content type if a file is successfully read
+    # Determine content type before touching the file's contents
     content_type = None
     if status_code == 200:
-        ext = os.path.splitext(abs_path)[1].lower()
-        if ext in MIME_TYPES:
-            content_type = MIME_TYPES[ext]
-        else:
+        dot = abs_path.rfind(".")
+        ext = abs_path[dot:].lower() if dot > abs_path.rfind(os.sep) + 1 else ""
+        content_type = MIME_TYPES.get(ext)
+        if content_type is None:
             status_code = 415  # unsupported file type
-    # Handle conditional GET: If-Modified-Since
-    if status_code == 200 and "If-Modified-Since" in headers:
-        ims_str = headers["If-Modified-Since"]
+    # Precompressed sibling: clients accepting gzip get "<file>.gz" when it is
+    # a regular file (lstat: no symlink out of the root) at least as new
+    if (status_code == 200 and content_type in COMPRESSIBLE_TYPES
+            and "accept-encoding" in headers and accepts_gzip(headers["accept-encoding"])):
         try:
-            ims_dt = email.utils.parsedate_to_datetime(ims_str)
-        except Exception:
-            ims_dt = None
-        if ims_dt:
-            if ims_dt.tzinfo is None:
-                ims_dt = ims_dt.replace(tzinfo=timezone.utc)
-            if file_mtime is not None:
-                # Compare file mod time (as UTC datetime without microseconds)
-                last_mod_dt = datetime.fromtimestamp(file_mtime, tz=timezone.utc).replace(microsecond=0)
-                if last_mod_dt <= ims_dt:
-                    status_code = 304  # Not Modified
-    # Prepare response body and headers based on the status code
+            gz_st = os.lstat(abs_path + GZIP_SUFFIX)
+        except OSError:
+            gz_st = None
+        if gz_st is not None and stat.S_ISREG(gz_st.st_mode) and gz_st.st_mtime_ns >= st.st_mtime_ns:
+            abs_path += GZIP_SUFFIX
+            st = gz_st
+    # Conditional GET, decided from the stat result alone so that a 304
+    # never opens the file: If-None-Match wins over If-Modified-Since
+    etag = None
     if status_code == 200:
-        # 200 OK: body is file content (for GET) or empty (for HEAD)
-        body = content if method == "GET" else b""
-    elif status_code != 304:
-        # Error responses (400, 403, 404, 415): generate a simple HTML page
-        reason = STATUS_PHRASES.get(status_code, "")
-        error_html = (f"<html><head><title>{status_code} {reason}</title></head>"
-                      f"<body><h1>{status_code} {reason}</h1>"
-                      f"<p>The requested resource is not available.</p></body></html>")
-        body = error_html.encode("utf-8")
-        content_type = "text/html"
-    # Start building the response lines
-    reason_phrase = STATUS_PHRASES.get(status_code, "")
-    status_line = f"{version} {status_code} {reason_phrase}\r\n"
+        etag = make_etag(st)
+        if "if-none-match" in headers:
+            if etag_matches(headers["if-none-match"], etag):
+                status_code = 304  # Not Modified
+        elif "if-modified-since" in headers:
+            ims = email.utils.parsedate_tz(headers["if-modified-since"])
+            if ims is not None:
+                # Compare whole epoch seconds; a date without a zone counts as GMT
+                try:
+                    ims_ts = calendar.timegm(ims) - (ims[9] or 0)
+                except (ValueError, OverflowError):
+                    ims_ts = None
+                if ims_ts is not None and int(st.st_mtime) <= ims_ts:
+                    status_code = 304  # Not Modified
+    # If OK so far, fetch the file: cached bytes, or an open file to stream
+    file_head_tpl = b""
+    content = None
+    body_file = None
+    if status_code == 200 and method == "HEAD":
+        file_head_tpl = static_file_head(abs_path, st, content_type)  # no open, no read
+    elif status_code == 200:
+        try:
+            file_head_tpl, content, body_file = open_static_file(abs_path, st, content_type)
+        except FileNotFoundError:
+            status_code = 404
+        except PermissionError:
+            status_code = 403
+        except Exception:
+            status_code = 404
+    # 200 OK: cached content for GET, empty for HEAD or streamed files
+    if status_code == 200 and content is not None:
+        body = content
     # Date header (HTTP-date format)
-    response_headers["Date"] = format_http_date(time.time())
+    date = current_http_date().encode()
     # Connection header: decide if we will close or keep the connection alive
-    conn_hdr = headers.get("Connection", "").lower()
-    if version == "HTTP/1.1":
-        # HTTP/1.1 defaults to keep-alive unless "Connection: close"
-        if conn_hdr == "close":
-            response_headers["Connection"] = "close"
-            keep_alive = False
-        else:
-            response_headers["Connection"] = "keep-alive"
-            keep_alive = True
-    else:  # HTTP/1.0
-        # HTTP/1.0 closes by default, unless "Connection: keep-alive" is present
-        if conn_hdr == "keep-alive":
-            response_headers["Connection"] = "keep-alive"
-            keep_alive = True
-        else:
-            response_headers["Connection"] = "close"
-            keep_alive = False
-    # Last-Modified header for OK responses
-    if status_code == 200 and file_mtime is not None:
-        response_headers["Last-Modified"] = format_http_date(file_mtime)
-    # Content-Type header (if available and not a 304 response)
-    if content_type and status_code != 304:
-        response_headers["Content-Type"] = content_type
-    # Content-Length header (for all responses with a body, including 0-length for HEAD or errors)
-    if status_code != 304:
-        if status_code == 200 and method == "HEAD":
-            response_headers["Content-Length"] = str(len(content))
-        else:
-            response_headers["Content-Length"] = str(len(body))
-    # Assemble the response headers into a byte sequence
-    headers_bytes = "".join(f"{name}: {value}\r\n" for name, value in response_headers.items()).encode("utf-8")
-    # Combine status line, headers, and body into final response bytes
-    response_bytes = status_line.encode("utf-8") + headers_bytes + b"\r\n" + body
-    return response_bytes, keep_alive, status_code
+    conn_hdr = headers.get("connection", "")
+    decision = CONN_DECISION.get((version, conn_hdr))
+    if decision is None and conn_hdr:           # rarer spellings, e.g. "KEEP-ALIVE"
+        decision = CONN_DECISION.get((version, conn_hdr.lower()))
+    keep_alive, connection = decision or CONN_DEFAULT[version]
+    # 200 OK: the cached head only lacks version, Date and Connection
+    if status_code == 200:
+        head = file_head_tpl % (version.encode(), date, connection)
+        return head, body, body_file, keep_alive, status_code
+    # 304 and error pages (403, 404, 415) are fully pre-serialized but for Date
+    response = ERROR_RESPONSES[(status_code, version, connection)]
+    if status_code == 304:
+        vary = VARY_ENCODING if content_type in COMPRESSIBLE_TYPES else b""
+        head = response % (date, etag.encode(), vary)
+    else:
+        head = response % date
+    return head, body, body_file, keep_alive, status_code
 
-def handle_client(client_sock, client_addr):
+def handle_client(client_sock, client_addr, park=None, pending=b"", head_deadline=None):
     """
-    Serve all HTTP requests from one client socket.
-    Runs in a dedicated thread; supports keep-alive.
+    Serve the requests waiting on one client socket.
+    Runs on a pool worker thread once the event loop has seen the socket
+    become readable, so a single recv takes whatever has arrived. pending
+    holds bytes already read past the previous request; pipelined requests
+    found in the buffer are served in turn.
+    A connection that stays open (keep-alive), or whose head is still
+    incomplete, is handed back through park(client_sock, client_addr,
+    pending, head_deadline) rather than holding the worker while it waits;
+    head_deadline (monotonic) bounds the whole head, not each read.
+    Without park the head is read here and the connection closed after.
     """
     client_ip, client_port = client_addr
     addr_str = f"{client_ip}:{client_port}"
+    keep_alive = False
 
     try:
-        while True:                                    # loop for persistent connection
-            request_bytes = b""
-            while b"\r\n\r\n" not in request_bytes:
-                chunk = client_sock.recv(1024)
-                if not chunk:
+        buf = recv_buffer()
+        view = memoryview(buf)
+        received = len(pending)
+        buf[:received] = pending
+        pending = b""                                   # only this call's leftover is parked
+        read_once = False
+        while True:
+            keep_alive = False                          # until this request's response says so
+            # a pipelined head may already sit complete in the leftover bytes
+            head_end = buf.find(b"\r\n\r\n", 0, received)
+            while head_end == -1 and received < len(buf):   # recv straight into buf
+                if read_once and park is not None:
+                    # nothing more has arrived: wait for the rest of the head on
+                    # the event loop, not on this worker
+                    pending = view[:received].tobytes()
+                    if not received:
+                        head_deadline = None            # plain keep-alive idle
+                    elif head_deadline is None:
+                        head_deadline = time.monotonic() + CLIENT_TIMEOUT
+                    elif time.monotonic() >= head_deadline:
+                        return                          # head took too long: drop the client
+                    keep_alive = True
+                    return
+                try:
+                    n = client_sock.recv_into(view[received:])
+                except TimeoutError:
+                    return                              # head stalled: drop the client
+                read_once = True
+                if not n:
                     break                               # client closed
-                request_bytes += chunk
-            if not request_bytes:                       # nothing received
-                break
+                received += n
+                # only the newly arrived bytes (plus 3 of overlap) need scanning
+                head_end = buf.find(b"\r\n\r\n", max(0, received - n - 3), received)
+            if not received:                            # nothing received
+                return
+            consumed = head_end + 4 if head_end != -1 else received
+            request_bytes = view[:consumed].tobytes()
 
             try:
+                if head_end == -1:
+                    raise ValueError("Truncated or oversized request head")
                 method, path, version, headers, req_line = parse_request(request_bytes)
             except PermissionError:
                 status = 403
-                reason = STATUS_PHRASES[status]
-                body = (f"<html><body><h1>{status} {reason}</h1>"
-                        f"<p>The requested resource is forbidden.</p></body></html>")
-                proto = "HTTP/1.1" if b"HTTP/1.1" in request_bytes else "HTTP/1.0"
-                resp = (f"{proto} {status} {reason}\r\n"
-                        f"Date: {format_http_date(time.time())}\r\n"
-                        f"Content-Type: text/html\r\n"
-                        f"Content-Length: {len(body.encode())}\r\n"
-                        f"Connection: close\r\n\r\n"
-                        f"{body}")
-                client_sock.sendall(resp.encode())
+                proto = b"HTTP/1.1" if b"HTTP/1.1" in request_bytes else b"HTTP/1.0"
+                date = current_http_date().encode()
+                client_sock.sendall(RESP_403 % (proto, date))
                 first_line = request_bytes.split(b"\r\n", 1)[0].decode("iso-8859-1", "ignore")
                 log_request(addr_str, first_line, status)
-                break                                   # close socket after 403
+                return                                  # close socket after 403
             except ValueError:                          # malformed request → 400
                 status = 400
-                reason = STATUS_PHRASES[status]
-                body = (f"<html><body><h1>{status} {reason}</h1>"
-                        f"<p>Bad request.</p></body></html>")
-                proto = "HTTP/1.1" if b"HTTP/1.1" in request_bytes else "HTTP/1.0"
-                resp = (f"{proto} {status} {reason}\r\n"
-                        f"Date: {format_http_date(time.time())}\r\n"
-                        f"Content-Type: text/html\r\n"
-                        f"Content-Length: {len(body.encode())}\r\n"
-                        f"Connection: close\r\n\r\n"
-                        f"{body}")
-                client_sock.sendall(resp.encode())
+                proto = b"HTTP/1.1" if b"HTTP/1.1" in request_bytes else b"HTTP/1.0"
+                date = current_http_date().encode()
+                client_sock.sendall(RESP_400 % (proto, date))
                 first_line = request_bytes.split(b"\r\n", 1)[0].decode("iso-8859-1", "ignore")
                 log_request(addr_str, first_line, status)
-                break                                   # close socket after 400
+                return                                  # close socket after 400
 
-            # ▸ normal processing via build_response --------------------------
-            response_bytes, keep_alive, status_code = build_response(
+            # ▸ normal processing via build_response ------------------------------
+            head, body, body_file, keep_alive, status_code = build_response(
                 method, path, version, headers
             )
-            client_sock.sendall(response_bytes)
+            try:
+                if body_file is None:
+                    send_response(client_sock, head, body)
+                else:
+                    try:
+                        # cork so the head rides in the body's first segment
+                        # instead of a lone packet (TCP_NODELAY is on)
+                        if TCP_CORK is not None:
+                            client_sock.setsockopt(socket.IPPROTO_TCP, TCP_CORK, 1)
+                        client_sock.sendall(head)
+                        send_file(client_sock, body_file)
+                        if TCP_CORK is not None:
+                            client_sock.setsockopt(socket.IPPROTO_TCP, TCP_CORK, 0)
+                    finally:
+                        release_fd(body_file)
+            except BaseException:
+                keep_alive = False                      # never park a broken socket
+                raise
             log_request(addr_str, req_line, status_code)
-
-            if not keep_alive:                          # client or protocol said close
+            if not keep_alive:
                 break
+            # shift the bytes behind this request (pipelined data) to the front
+            received -= consumed
+            buf[:received] = view[consumed:consumed + received].tobytes()
+            head_deadline = None                        # the next head gets its own
+            read_once = True                            # this readiness is used up
+    finally:
+        if keep_alive and park is not None:             # wait for the next request
+            park(client_sock, client_addr, pending, head_deadline)
+        else:                                           # client or protocol said close
+            client_sock.close()
+
+def reject_client(client_sock, client_addr):
+    """
+    Answer a connection with 503 and close it when every worker slot is taken.
+    """
+    status = 503
+    date = current_http_date().encode()
+    try:
+        client_sock.sendall(RESP_503 % (b"HTTP/1.1", date))
+    except OSError:
+        pass
     finally:
         client_sock.close()
+    log_request(f"{client_addr[0]}:{client_addr[1]}", "", status)
 
 def run_server(host: str = HOST, port: int = PORT):
     """
-    Start the multi-threaded HTTP server: accept connections and
-    hand each one off to handle_client() in its own thread.
+    Start the multi-threaded HTTP server. One event loop watches the
+    listening socket and every idle connection; it accepts new clients and,
+    whenever a connection has a request waiting, hands it to handle_client()
+    on a reusable worker thread. Workers park keep-alive connections back on
+    the loop, so idle clients cost a selector entry instead of a thread.
     """
     os.makedirs(WWW_ROOT, exist_ok=True)          # ensure web-root exists
 
     server_sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    if hasattr(socket, "SO_REUSEPORT"):          # Linux 3.9+, BSD, macOS
+        # lets several server processes share the port; the kernel spreads accepts
+        server_sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
     server_sock.bind((host, port))
-    server_sock.listen(5)
+    server_sock.listen(LISTEN_BACKLOG)
+    server_sock.setblocking(False)    # accept() must never block the loop
+
+    # Workers hand keep-alive sockets back through `parked` and nudge the loop
+    # awake by writing to waker_w; only the loop thread touches the selector
+    parked = queue.SimpleQueue()
+    waker_r, waker_w = socket.socketpair()
+    waker_r.setblocking(False)
+
+    def park(client_sock, client_addr, pending=b"", deadline=None):
+        parked.put((client_sock, client_addr, pending, deadline))
+        try:
+            waker_w.send(b"\0")
+        except OSError:
+            pass                      # loop already shut down
+
+    selector = selectors.DefaultSelector()       # epoll/kqueue where available
+    selector.register(server_sock, selectors.EVENT_READ)
+    selector.register(waker_r, selectors.EVENT_READ)
+    # idle socket -> (client_addr, close deadline, pending); with pending (a
+    # partial head) the deadline is the head's, otherwise the keep-alive one
+    idle = {}
+    workers = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="http")
+    logger = threading.Thread(target=log_writer, name="log-writer", daemon=True)
+    logger.start()
+    slots = threading.BoundedSemaphore(MAX_CONNECTIONS)   # caps queued work
     print(f"Serving HTTP on {host} port {port} …")
 
+    def watch(client_sock, client_addr, pending=b"", deadline=None):
+        if deadline is None:
+            deadline = time.monotonic() + KEEP_ALIVE_TIMEOUT
+        idle[client_sock] = (client_addr, deadline, pending)
+        selector.register(client_sock, selectors.EVENT_READ)
+
+    next_sweep = time.monotonic() + 1
+    accept_resume = None              # when a paused listener is watched again
     try:
         while True:
-            client_sock, client_addr = server_sock.accept()
-
-            t = threading.Thread(target=handle_client, args=(client_sock, client_addr))
-            t.daemon = True            # optional: threads exit when main exits
-            t.start()                  # immediately return to accept the next client
+            if accept_resume is not None and time.monotonic() >= accept_resume:
+                accept_resume = None
+                selector.register(server_sock, selectors.EVENT_READ)
+            for key, _events in selector.select(timeout=ACCEPT_PAUSE if accept_resume else 1):
+                sock = key.fileobj
+                if sock is server_sock:
+                    while True:        # drain every pending connection per wakeup
+                        try:
+                            client_sock, client_addr = server_sock.accept()
+                        except BlockingIOError:
+                            break
+                        except OSError as exc:
+                            if exc.errno in (errno.EMFILE, errno.ENFILE, errno.ENOBUFS, errno.ENOMEM):
+                                # out of descriptors/memory: the pending connection
+                                # stays queued, so stop watching the listener briefly
+                                # instead of spinning on it
+                                print(f"[ACCEPT] {exc.strerror}; pausing for {ACCEPT_PAUSE}s")
+                                selector.unregister(server_sock)
+                                accept_resume = time.monotonic() + ACCEPT_PAUSE
+                                break
+                            continue       # e.g. ECONNABORTED: that client is gone
+                        # a client that sends half a head or stops reading must not
+                        # pin a worker (or hold up shutdown) forever
+                        client_sock.settimeout(CLIENT_TIMEOUT)
+                        # small heads/bodies go out at once instead of waiting on Nagle
+                        client_sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                        # let the kernel probe clients that vanish without a FIN
+                        client_sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+                        watch(client_sock, client_addr)
+                elif sock is waker_r:
+                    try:
+                        while waker_r.recv(4096):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    while not parked.empty():
+                        watch(*parked.get())
+                else:                  # a request (or EOF) is waiting
+                    selector.unregister(sock)
+                    client_addr, deadline, pending = idle.pop(sock)
+                    if not slots.acquire(blocking=False):
+                        reject_client(sock, client_addr)
+                        continue
+                    future = workers.submit(handle_client, sock, client_addr, park, pending,
+                                            deadline if pending else None)
+                    future.add_done_callback(lambda _f: slots.release())
+            now = time.monotonic()
+            if now >= next_sweep:      # close connections idle for too long
+                next_sweep = now + 1
+                for sock, (_addr, deadline, _pending) in list(idle.items()):
+                    if deadline <= now:
+                        selector.unregister(sock)
+                        del idle[sock]
+                        sock.close()
     except KeyboardInterrupt:
         print("\n[SHUTDOWN] Server stopped by user")
     finally:
+        selector.close()
         server_sock.close()
+        for sock in idle:
+            sock.close()
+        waker_r.close()
+        waker_w.close()
+        workers.shutdown(wait=False, cancel_futures=True)
+        LOG_QUEUE.put(None)            # flush queued log entries, then stop
+        logger.join(timeout=1)
 
 if __name__ == "__main__":
     run_server()
@@ -1,94 +1,132 @@
 import socket
+import os
 import threading
+import logging
+import logging.handlers
+import queue
+import sys
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 
 # --- Phase 1: Simple HTTP Server ---
 # --- Configuration ---
 HOST = '127.0.0.1'  # Localhost
 PORT = 8080  # Non-privileged port
-BUFFER_SIZE = 4096  # Increased buffer size for larger requests
+BUFFER_SIZE = 16384  # Receive buffer size; also the most of a request that is read
+DEBUG = False  # Log connection events and raw requests (costly per request)
+LISTEN_BACKLOG = 1024  # Pending-connection queue length for listen()
+MAX_WORKERS = max(32, (os.cpu_count() or 1) * 8)  # Threads handling clients (I/O-bound)
+CLIENT_TIMEOUT = 10  # Seconds a silent client may hold a worker
+
+log = logging.getLogger("server_simple")
+recv_local = threading.local()  # per-worker reusable receive buffer
 
 
 # --- Client Handler Function ---
 def handle_client(conn, addr):
     """Handles a client connection and logs the request."""
     client_ip = addr[0]
-    print(f"[NEW CONNECTION] {addr} connected.")
+    log.debug("[NEW CONNECTION] %s connected.", addr)
 
     try:
-        # Receive full HTTP request (may require multiple reads)
-        request_data = b''
-        while True:
-            chunk = conn.recv(BUFFER_SIZE)
-            if not chunk:
+        # Receive full HTTP request (may require multiple reads) straight
+        # into this worker's buffer
+        buf = getattr(recv_local, "buf", None)
+        if buf is None:
+            buf = recv_local.buf = bytearray(BUFFER_SIZE)
+        view = memoryview(buf)
+        received = 0
+        while received < len(buf):
+            n = conn.recv_into(view[received:])
+            if not n:
                 break
-            request_data += chunk
-            if b'\r\n\r\n' in request_data:  # Check for end of headers
+            received += n
+            # Check for end of headers; only the new bytes (plus 3) need scanning
+            if buf.find(b'\r\n\r\n', max(0, received - n - 3), received) != -1:
                 break
+        request_data = view[:received].tobytes()
 
         if not request_data:
-            print(f"[ERROR] No data received from {addr}")
+            log.warning("[ERROR] No data received from %s", addr)
             return
 
-        # Decode request and parse headers
-        decoded_request = request_data.decode('utf-8', errors='ignore')
-        headers = decoded_request.split('\r\n')
-        first_line = headers[0].split() if headers else []
-
-        # Extract request method and path
-        method = first_line[0] if len(first_line) > 0 else 'UNKNOWN'
-        path = first_line[1] if len(first_line) > 1 else '/'
+        # Extract request method and path from the request line; the rest
+        # of the request is never decoded
+        line_end = request_data.find(b'\r\n')
+        first_line = request_data[:line_end if line_end != -1 else len(request_data)].split()
+        method = first_line[0].decode('utf-8', errors='ignore') if len(first_line) > 0 else 'UNKNOWN'
+        path = first_line[1].decode('utf-8', errors='ignore') if len(first_line) > 1 else '/'
 
         # Log request details (Phase 1 requirement)
         timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        log_entry = (
-            f"[{timestamp}] Client: {client_ip} | "
-            f"Requested File: {path} | Method: {method}"
-        )
-        print(log_entry)
+        log.info("[%s] Client: %s | Requested File: %s | Method: %s",
+                 timestamp, client_ip, path, method)
 
-        # Display raw request (for debugging)
-        print(f"\n--- Raw Request from {addr} ---")
-        print(decoded_request.strip())
-        print("------------------------------------")
+        # Display raw request (for debugging only; skips the decode otherwise)
+        if log.isEnabledFor(logging.DEBUG):
+            log.debug("\n--- Raw Request from %s ---\n%s\n------------------------------------",
+                      addr, request_data.decode('utf-8', errors='ignore').strip())
 
+    except TimeoutError:
+        # silent clients (e.g. a browser's speculative preconnects) are routine
+        log.debug("[TIMEOUT] %s sent nothing within %ss", addr, CLIENT_TIMEOUT)
     except socket.error as e:
-        print(f"[SOCKET ERROR] {addr}: {e}")
+        log.error("[SOCKET ERROR] %s: %s", addr, e)
     except Exception as e:
-        print(f"[UNEXPECTED ERROR] {addr}: {e}")
+        log.error("[UNEXPECTED ERROR] %s: %s", addr, e)
     finally:
         # Phase 1: Close connection without sending response
         conn.close()
-        print(f"[CLOSED] Connection to {addr} closed\n")
+        log.debug("[CLOSED] Connection to %s closed\n", addr)
+
+
+# --- Logging Setup ---
+def start_logging():
+    """
+    Route log records through a queue so request threads never wait on
+    stdout; one listener thread does the writing. Returns the listener.
+    """
+    records = queue.SimpleQueue()
+    console = logging.StreamHandler(sys.stdout)
+    console.setFormatter(logging.Formatter("%(message)s"))
+    listener = logging.handlers.QueueListener(records, console)
+    log.addHandler(logging.handlers.QueueHandler(records))
+    log.setLevel(logging.DEBUG if DEBUG else logging.INFO)
+    log.propagate = False
+    listener.start()
+    return listener
 
 
 # --- Main Server Function ---
 def start_server():
-    """Starts the multi-threaded server."""
+    """Starts the server; a fixed pool of worker threads handles the clients."""
+    listener = start_logging()
     server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
 
     try:
         server_socket.bind((HOST, PORT))
-        server_socket.listen(5)
-        print(f"[LISTENING] Server running on {HOST}:{PORT}\n")
+        server_socket.listen(LISTEN_BACKLOG)
+        log.info("[LISTENING] Server running on %s:%s\n", HOST, PORT)
     except Exception as e:
-        print(f"[ERROR] Failed to start server: {e}")
+        log.error("[ERROR] Failed to start server: %s", e)
+        listener.stop()
         return
 
+    pool = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix="client")
     try:
         while True:
             conn, addr = server_socket.accept()
-            thread = threading.Thread(target=handle_client, args=(conn, addr))
-            thread.daemon = True
-            thread.start()
-            print(f"[ACTIVE CONNECTIONS] {threading.active_count() - 1}")
+            conn.settimeout(CLIENT_TIMEOUT)  # pool threads are few and not daemonic
+            pool.submit(handle_client, conn, addr)  # queued if every worker is busy
     except KeyboardInterrupt:
-        print("\n[SHUTDOWN] Server stopped by user")
+        log.info("\n[SHUTDOWN] Server stopped by user")
     finally:
         server_socket.close()
+        pool.shutdown(wait=False, cancel_futures=True)
+        listener.stop()  # flush what is still queued
 
 
 # --- Entry Point ---
 if __name__ == "__main__":
-    start_server()
\ No newline at end of file
+    start_server()